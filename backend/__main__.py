@@ -14,13 +14,24 @@ def main() -> None:
         action="store_true",
         help="Enable auto-reload (useful for development; disables when packaging)",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes sharing state and the catalog cache (default: 1)",
+    )
     args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.reload and args.workers > 1:
+        parser.error("--reload cannot be combined with --workers")
 
     uvicorn.run(
         "backend.main:app",
         host=args.host,
         port=args.port,
         reload=args.reload,
+        workers=args.workers,
     )
 
 
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import hashlib
+import re
+from pathlib import Path
+from typing import Any, Callable, Dict, Tuple
+from urllib.parse import parse_qs
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import HTMLResponse, JSONResponse, Response
+from fastapi.staticfiles import StaticFiles
+from starlette.types import Scope
+
+FINGERPRINTED_ASSETS = ("app.js", "styles.css")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+_ASSET_REFERENCE = re.compile(
+    r'(?P<attr>src|href)="(?P<asset>' + "|".join(re.escape(a) for a in FINGERPRINTED_ASSETS) + r')"'
+)
+
+
+def make_etag(*parts: Any) -> str:
+    digest = hashlib.sha1(":".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+    # Weak validator: the same view may be sent gzip/brotli encoded or identity.
+    return f'W/"{digest[:20]}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    wanted = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == wanted for candidate in header.split(",")
+    )
+
+
+def not_modified(etag: str) -> Response:
+    return Response(
+        status_code=304,
+        headers={"ETag": etag, "Cache-Control": REVALIDATE_CACHE_CONTROL},
+    )
+
+
+def conditional_json(request: Request, etag: str, build: Callable[[], Any]) -> Response:
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return JSONResponse(
+        jsonable_encoder(build()),
+        headers={"ETag": etag, "Cache-Control": REVALIDATE_CACHE_CONTROL},
+    )
+
+
+class FrontendStaticFiles(StaticFiles):
+    """Serves the frontend with fingerprinted, long-lived caching for its bundles.
+
+    ``index.html`` is rewritten so ``app.js`` and ``styles.css`` are requested as
+    ``app.js?v=<hash>``; those URLs are cached forever while the page itself is
+    always revalidated, so an edited asset is picked up on the next page load.
+    """
+
+    def __init__(self, *, directory: Path, html: bool = False) -> None:
+        super().__init__(directory=directory, html=html)
+        self.root = Path(directory)
+        self._fingerprints: Dict[str, Tuple[Tuple[int, int], str]] = {}
+
+    def fingerprint(self, asset: str) -> str:
+        path = self.root / asset
+        stat = path.stat()
+        key = (stat.st_mtime_ns, stat.st_size)
+        cached = self._fingerprints.get(asset)
+        if cached and cached[0] == key:
+            return cached[1]
+        digest = hashlib.sha256(path.read_bytes()).hexdigest()[:12]
+        self._fingerprints[asset] = (key, digest)
+        return digest
+
+    def render_index(self) -> str:
+        template = (self.root / "index.html").read_text(encoding="utf-8")
+        return _ASSET_REFERENCE.sub(self._fingerprint_reference, template)
+
+    def _fingerprint_reference(self, match: re.Match) -> str:
+        asset = match["asset"]
+        return f'{match["attr"]}="{asset}?v={self.fingerprint(asset)}"'
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if self.html and path in {".", "index.html"} and (self.root / "index.html").is_file():
+            return self._index_response(Request(scope))
+
+        response = await super().get_response(path, scope)
+        if response.status_code not in (200, 304):
+            return response
+        version = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("v", [None])[0]
+        if path in FINGERPRINTED_ASSETS and version == self.fingerprint(path):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        else:
+            response.headers["Cache-Control"] = REVALIDATE_CACHE_CONTROL
+        return response
+
+    def _index_response(self, request: Request) -> Response:
+        content = self.render_index()
+        etag = make_etag("index", content)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        return HTMLResponse(
+            content,
+            headers={"ETag": etag, "Cache-Control": REVALIDATE_CACHE_CONTROL},
+        )
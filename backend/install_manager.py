@@ -1,26 +1,59 @@
 from __future__ import annotations
 
+import hashlib
 import shutil
 import tempfile
+import threading
 import zipfile
+from contextlib import ExitStack, contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 import requests
+from filelock import Timeout
 
+from .modlist import LockedMod, Modlist, ModlistImportResult
 from .state_manager import InstalledFile, InstalledMod, StateManager
-from .thunderstore import ThunderstoreError, get_package, latest_version
+from .storage import LOCK_TIMEOUT, file_lock
+from .thunderstore import (
+    ThunderstoreError,
+    format_dependency,
+    get_package,
+    latest_version,
+    lookup_package,
+)
 
 MELON_LOADER_PREFIX = "LavaGang-MelonLoader"
+MODLIST_DOWNLOAD_WORKERS = 8
+# Kept short: a second request for a mod that is already being installed should
+# fail fast instead of tying up a worker thread until the first one finishes.
+# Dependency locks wait with the regular LOCK_TIMEOUT instead, since another
+# install fetching a shared dependency is expected to finish and satisfy it.
+MOD_LOCK_TIMEOUT = 10
 
 
 class InstallError(RuntimeError):
     pass
 
 
+class ModBusyError(InstallError):
+    def __init__(self, key: str):
+        super().__init__(f"Another operation on {key} is in progress. Try again shortly.")
+
+
+class DependentModsError(InstallError):
+    def __init__(self, namespace: str, name: str, dependents: List[InstalledMod]):
+        self.dependents = dependents
+        names = ", ".join(mod.key for mod in dependents)
+        super().__init__(f"{namespace}.{name} is required by: {names}")
+
+
 class InstallManager:
     def __init__(self, state_manager: StateManager):
         self.state_manager = state_manager
+        self.lock_dir = state_manager.state_file.parent / "locks"
+        self._held_locks = threading.local()
 
     @property
     def game_directory(self) -> Optional[Path]:
@@ -37,7 +70,45 @@ class InstallManager:
         (game_dir / "Plugins").mkdir(exist_ok=True)
         return game_dir
 
-    def install(self, namespace: str, name: str, version: Optional[str] = None) -> InstalledMod:
+    @contextmanager
+    def _mod_lock(
+        self, namespace: str, name: str, timeout: float = MOD_LOCK_TIMEOUT
+    ) -> Iterator[None]:
+        with self._mod_locks([f"{namespace}.{name}"], timeout):
+            yield
+
+    @contextmanager
+    def _mod_locks(
+        self, keys: Iterable[str], timeout: float = MOD_LOCK_TIMEOUT
+    ) -> Iterator[None]:
+        # Serialises installs/uninstalls of mods across threads and workers. Locks
+        # are taken in sorted order, and ones this thread already holds are reused.
+        held: Set[str] = self._held_locks.__dict__.setdefault("keys", set())
+        with ExitStack() as stack:
+            for key in sorted(set(keys) - held):
+                lock = file_lock(self.lock_dir / key, timeout=timeout)
+                try:
+                    lock.acquire()
+                except Timeout as exc:
+                    raise ModBusyError(key) from exc
+                stack.callback(lock.release)
+                held.add(key)
+                stack.callback(held.discard, key)
+            yield
+
+    def install(
+        self,
+        namespace: str,
+        name: str,
+        version: Optional[str] = None,
+        as_dependency: bool = False,
+    ) -> InstalledMod:
+        with self._mod_lock(namespace, name):
+            return self._install(namespace, name, version, as_dependency)
+
+    def _install(
+        self, namespace: str, name: str, version: Optional[str], as_dependency: bool
+    ) -> InstalledMod:
         if self.state_manager.is_blacklisted(namespace, name):
             raise InstallError("Mod is blacklisted. Whitelist it to install.")
 
@@ -48,56 +119,285 @@ class InstallManager:
         version_info = self._select_version(package, version)
 
         existing = self.state_manager.get_installed_mod(namespace, name)
+        # Explicitly installing a mod that was pulled in as a dependency keeps it
+        # from being pruned as an orphan later on.
+        installed_as_dependency = as_dependency and (
+            existing.installed_as_dependency if existing else True
+        )
         if existing and existing.version == version_info.get("version_number"):
+            if existing.installed_as_dependency != installed_as_dependency:
+                existing.installed_as_dependency = installed_as_dependency
+                self.state_manager.install_mod(existing)
             return existing
         if existing:
-            self._remove_installed_files(existing)
+            self._remove_installed_files([existing])
             self.state_manager.uninstall_mod(namespace, name)
 
-        dependencies = [
-            dep
-            for dep in version_info.get("dependencies", [])
-            if not dep.startswith(MELON_LOADER_PREFIX)
-        ]
+        dependencies = self._filter_dependencies(version_info)
+
+        # Dependency locks are held until this mod is recorded, so a dependency
+        # cannot be uninstalled before it gains its new dependent.
+        with ExitStack() as dependency_locks:
+            for dep in dependencies:
+                dep_namespace, dep_name, *_ = dep.split("-")
+                dependency_locks.enter_context(
+                    self._mod_lock(dep_namespace, dep_name, timeout=LOCK_TIMEOUT)
+                )
+                if self.state_manager.get_installed_mod(dep_namespace, dep_name):
+                    continue
+                self._install(dep_namespace, dep_name, None, as_dependency=True)
+
+            with tempfile.TemporaryDirectory() as tmpdir:
+                archive_path = Path(tmpdir) / "package.zip"
+                archive_sha256 = self._download_file(version_info["download_url"], archive_path)
+                installed_files = self._apply_archive(archive_path)
+
+            mod = self._build_installed_mod(
+                namespace,
+                name,
+                package,
+                version_info,
+                installed_files,
+                installed_as_dependency,
+                archive_sha256,
+            )
+            self.state_manager.install_mod(mod)
+            return mod
+
+    def install_modlist(self, modlist: Modlist) -> ModlistImportResult:
+        """Install the exact set of mods pinned in ``modlist``.
 
-        for dep in dependencies:
-            dep_namespace, dep_name, *_ = dep.split("-")
-            if self.state_manager.get_installed_mod(dep_namespace, dep_name):
+        Every entry is resolved against the cached catalog up front (falling back
+        to the package endpoint for versions newer than the cache); entries that
+        are already installed at the pinned version are skipped. The remaining
+        archives are downloaded concurrently and applied as they arrive, each one
+        recorded in state while its mod lock is still held. Dependencies are not
+        re-resolved since the lockfile already lists the complete set, but an
+        entry is only applied once every dependency it lists is installed; if one
+        failed or is missing, the entry is reported as failed too.
+        """
+        self.ensure_game_directory()
+        result = ModlistImportResult()
+        installed = {mod.key: mod for mod in self.state_manager.list_installed_mods()}
+        blacklisted = set(self.state_manager.list_blacklisted_mods())
+
+        pending: List[Tuple[LockedMod, Dict, Dict]] = []
+        for locked in modlist.mods:
+            if locked.key in blacklisted:
+                result.failed[locked.key] = "Mod is blacklisted. Whitelist it to install."
+                continue
+            existing = installed.get(locked.key)
+            if existing and existing.version == locked.version:
+                result.skipped.append(locked.key)
                 continue
-            self.install(dep_namespace, dep_name)
+            try:
+                package = lookup_package(locked.namespace, locked.name)
+                try:
+                    version_info = self._select_version(package, locked.version)
+                except InstallError:
+                    # The cached catalog may predate the pinned version.
+                    package = get_package(locked.namespace, locked.name)
+                    version_info = self._select_version(package, locked.version)
+            except (ThunderstoreError, InstallError) as exc:
+                result.failed[locked.key] = str(exc)
+                continue
+            if not version_info.get("download_url"):
+                result.failed[locked.key] = "Package version has no download URL"
+                continue
+            pending.append((locked, package, version_info))
 
-        download_url = version_info["download_url"]
         with tempfile.TemporaryDirectory() as tmpdir:
-            archive_path = Path(tmpdir) / "package.zip"
-            self._download_file(download_url, archive_path)
-            extracted_dir = Path(tmpdir) / "extracted"
-            extracted_dir.mkdir()
-            with zipfile.ZipFile(archive_path, "r") as zip_ref:
-                zip_ref.extractall(extracted_dir)
 
-            installed_files = self._copy_mod_files(extracted_dir)
+            def fetch(locked: LockedMod, version_info: Dict) -> Tuple[Path, str]:
+                archive_path = Path(tmpdir) / f"{locked.key}.zip"
+                digest = self._download_file(version_info["download_url"], archive_path)
+                if locked.archive_sha256 and digest != locked.archive_sha256:
+                    raise InstallError(
+                        f"Archive hash mismatch (expected {locked.archive_sha256}, got {digest})"
+                    )
+                return archive_path, digest
+
+            pending_keys = {locked.key for locked, _, _ in pending}
+            applied: Set[str] = set()
+            downloaded: Dict[str, Tuple[LockedMod, Dict, Dict, Path, str]] = {}
+
+            def dependency_status(locked: LockedMod) -> Tuple[bool, Optional[str]]:
+                # Returns (ready, failure reason); not ready while a dependency is in flight.
+                ready = True
+                for dep in locked.dependencies:
+                    if dep.startswith(MELON_LOADER_PREFIX):
+                        continue
+                    dep_key = format_dependency(dep)
+                    if dep_key in result.failed:
+                        return True, f"Dependency {dep_key} failed to install"
+                    if dep_key in pending_keys and dep_key not in applied:
+                        ready = False
+                    elif dep_key not in applied and dep_key not in installed:
+                        return True, f"Dependency {dep_key} is not installed or in the modlist"
+                return ready, None
+
+            def apply(
+                locked: LockedMod,
+                package: Dict,
+                version_info: Dict,
+                archive_path: Path,
+                digest: str,
+            ) -> None:
+                try:
+                    with self._mod_lock(locked.namespace, locked.name):
+                        installed_files = self._replace_from_archive(locked, archive_path)
+                        self.state_manager.install_mod(
+                            self._build_installed_mod(
+                                locked.namespace,
+                                locked.name,
+                                package,
+                                version_info,
+                                installed_files,
+                                locked.installed_as_dependency,
+                                digest,
+                            )
+                        )
+                except (InstallError, zipfile.BadZipFile, OSError) as exc:
+                    result.failed[locked.key] = str(exc)
+                    return
+                applied.add(locked.key)
+                result.installed.append(locked.key)
+                if not locked.archive_sha256:
+                    result.unverified.append(locked.key)
+
+            def apply_ready() -> None:
+                # Applying or failing one entry can unblock its dependents, so repeat
+                # until a pass makes no progress.
+                progress = True
+                while progress:
+                    progress = False
+                    for key, entry in list(downloaded.items()):
+                        ready, problem = dependency_status(entry[0])
+                        if not ready:
+                            continue
+                        del downloaded[key]
+                        progress = True
+                        if problem:
+                            result.failed[key] = problem
+                        else:
+                            apply(*entry)
 
-        mod = InstalledMod(
+            with ThreadPoolExecutor(max_workers=MODLIST_DOWNLOAD_WORKERS) as executor:
+                futures = {
+                    executor.submit(fetch, entry[0], entry[2]): entry for entry in pending
+                }
+                for future in as_completed(futures):
+                    locked, package, version_info = futures[future]
+                    try:
+                        archive_path, digest = future.result()
+                    except (InstallError, requests.RequestException, OSError) as exc:
+                        result.failed[locked.key] = str(exc)
+                    else:
+                        downloaded[locked.key] = (
+                            locked,
+                            package,
+                            version_info,
+                            archive_path,
+                            digest,
+                        )
+                    apply_ready()
+
+            # Whatever is left waits on another leftover entry: a dependency cycle.
+            for key in downloaded:
+                result.failed[key] = "Circular dependency in modlist"
+
+        return result
+
+    def uninstall(
+        self, namespace: str, name: str, cascade: bool = False, prune_orphans: bool = True
+    ) -> List[InstalledMod]:
+        locked: Set[str] = {f"{namespace}.{name}"}
+        while True:
+            with self._mod_locks(locked):
+                removal, dependents = self.state_manager.plan_removal(
+                    namespace, name, cascade, prune_orphans
+                )
+                if dependents:
+                    raise DependentModsError(namespace, name, dependents)
+                keys = {mod.key for mod in removal}
+                if keys <= locked:
+                    self._remove_installed_files(removal)
+                    return self.state_manager.uninstall_mods(sorted(keys))
+            # Cascaded or orphaned mods must be locked too; re-plan once they are.
+            locked |= keys
+
+    def backfill_archive_hashes(self) -> None:
+        """Download and hash the archives of installed mods that have no recorded hash.
+
+        Mods installed before hashes were tracked otherwise export as unpinned.
+        Archives that can no longer be downloaded stay unpinned.
+        """
+        missing = [
+            mod
+            for mod in self.state_manager.list_installed_mods()
+            if not mod.archive_sha256 and mod.download_url
+        ]
+        hashes: Dict[str, Tuple[str, str]] = {}
+        with tempfile.TemporaryDirectory() as tmpdir:
+
+            def digest(mod: InstalledMod) -> str:
+                return self._download_file(mod.download_url, Path(tmpdir) / f"{mod.key}.zip")
+
+            with ThreadPoolExecutor(max_workers=MODLIST_DOWNLOAD_WORKERS) as executor:
+                futures = {executor.submit(digest, mod): mod for mod in missing}
+                for future in as_completed(futures):
+                    mod = futures[future]
+                    try:
+                        hashes[mod.key] = (mod.version, future.result())
+                    except (InstallError, requests.RequestException, OSError):
+                        continue
+        self.state_manager.record_archive_hashes(hashes)
+
+    def _replace_from_archive(self, locked: LockedMod, archive_path: Path) -> List[str]:
+        # Extract first so a corrupt archive leaves the installed version untouched.
+        with self._extract_archive(archive_path) as extracted_dir:
+            existing = self.state_manager.get_installed_mod(locked.namespace, locked.name)
+            if existing:
+                self._remove_installed_files([existing])
+            try:
+                return self._copy_mod_files(extracted_dir)
+            except OSError:
+                # The old files are gone; don't keep a state entry pointing at them.
+                if existing:
+                    self.state_manager.uninstall_mods([locked.key])
+                raise
+
+    def _filter_dependencies(self, version_info: Dict) -> List[str]:
+        return [
+            dep
+            for dep in version_info.get("dependencies", [])
+            if not dep.startswith(MELON_LOADER_PREFIX)
+        ]
+
+    def _build_installed_mod(
+        self,
+        namespace: str,
+        name: str,
+        package: Dict,
+        version_info: Dict,
+        installed_files: List[str],
+        installed_as_dependency: bool,
+        archive_sha256: str,
+    ) -> InstalledMod:
+        return InstalledMod(
             namespace=namespace,
             name=name,
             version=version_info["version_number"],
             display_name=package.get("name", name),
             author=package.get("owner", "Unknown"),
             summary=package.get("description", ""),
-            download_url=download_url,
+            download_url=version_info["download_url"],
             icon=package.get("icon"),
-            dependencies=dependencies,
+            dependencies=self._filter_dependencies(version_info),
             installed_files=[InstalledFile(relative_path=f) for f in installed_files],
+            installed_as_dependency=installed_as_dependency,
+            archive_sha256=archive_sha256,
         )
-        self.state_manager.install_mod(mod)
-        return mod
-
-    def uninstall(self, namespace: str, name: str) -> None:
-        mod = self.state_manager.get_installed_mod(namespace, name)
-        if not mod:
-            return
-        self._remove_installed_files(mod)
-        self.state_manager.uninstall_mod(namespace, name)
 
     def _select_version(self, package: Dict, version: Optional[str]) -> Dict:
         if version:
@@ -107,17 +407,33 @@ class InstallManager:
             raise InstallError("Requested version not found")
         return latest_version(package)
 
-    def _download_file(self, url: str, destination: Path) -> None:
+    def _download_file(self, url: str, destination: Path) -> str:
         try:
             response = requests.get(url, stream=True, timeout=60)
         except requests.RequestException as exc:
             raise InstallError(f"Failed to download package: {exc}") from exc
         if response.status_code != 200:
             raise InstallError(f"Failed to download package: {response.status_code}")
+        digest = hashlib.sha256()
         with destination.open("wb") as f:
             for chunk in response.iter_content(chunk_size=8192):
                 if chunk:
                     f.write(chunk)
+                    digest.update(chunk)
+        return digest.hexdigest()
+
+    def _apply_archive(self, archive_path: Path) -> List[str]:
+        with self._extract_archive(archive_path) as extracted_dir:
+            return self._copy_mod_files(extracted_dir)
+
+    @contextmanager
+    def _extract_archive(self, archive_path: Path) -> Iterator[Path]:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            extracted_dir = Path(tmpdir) / "extracted"
+            extracted_dir.mkdir()
+            with zipfile.ZipFile(archive_path, "r") as zip_ref:
+                zip_ref.extractall(extracted_dir)
+            yield extracted_dir
 
     def _copy_mod_files(self, extracted_dir: Path) -> List[str]:
         game_dir = self.ensure_game_directory()
@@ -154,30 +470,52 @@ class InstallManager:
             copy_contents(extracted_dir, mods_folder)
         return installed_files
 
-    def _remove_installed_files(self, mod: InstalledMod) -> None:
+    def _remove_installed_files(self, mods: Iterable[InstalledMod]) -> None:
         game_dir = self.game_directory
         if game_dir is None:
             return
-        for installed_file in mod.installed_files:
-            relative_path = (
-                installed_file.relative_path
-                if isinstance(installed_file, InstalledFile)
-                else getattr(installed_file, "relative_path", str(installed_file))
-            )
-            target = game_dir / relative_path
-            if target.exists():
+        mods = list(mods)
+        removed_keys = {mod.key for mod in mods}
+        # Files also claimed by a mod that stays installed are left in place.
+        retained = {
+            installed_file.relative_path
+            for other in self.state_manager.list_installed_mods()
+            if other.key not in removed_keys
+            for installed_file in other.installed_files
+        }
+        parents: Set[Path] = set()
+        for mod in mods:
+            for installed_file in mod.installed_files:
+                relative_path = (
+                    installed_file.relative_path
+                    if isinstance(installed_file, InstalledFile)
+                    else getattr(installed_file, "relative_path", str(installed_file))
+                )
+                if relative_path in retained:
+                    continue
+                target = game_dir / relative_path
                 if target.is_file():
                     target.unlink()
                 elif target.is_dir():
                     shutil.rmtree(target)
-                self._cleanup_empty_parents(target.parent, game_dir)
+                else:
+                    continue
+                parents.add(target.parent)
+        self._cleanup_empty_parents(parents, game_dir)
 
-    def _cleanup_empty_parents(self, path: Path, game_dir: Path) -> None:
+    def _cleanup_empty_parents(self, paths: Iterable[Path], game_dir: Path) -> None:
         stop_paths = {game_dir, game_dir / "Mods", game_dir / "Plugins"}
-        current = path
-        while current not in stop_paths:
+        candidates: Set[Path] = set()
+        for path in paths:
+            current = path
+            while current not in stop_paths and current not in candidates:
+                if game_dir not in current.parents:
+                    break
+                candidates.add(current)
+                current = current.parent
+        # Deepest first, so each directory is only tried once its children are gone.
+        for directory in sorted(candidates, key=lambda p: len(p.parts), reverse=True):
             try:
-                current.rmdir()
+                directory.rmdir()
             except OSError:
-                break
-            current = current.parent
+                continue
@@ -3,30 +3,57 @@ from __future__ import annotations
 from pathlib import Path
 from typing import Dict, List, Optional
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, RedirectResponse
+from filelock import Timeout
 from pydantic import BaseModel
 
+try:  # pragma: no cover - brotli is optional, gzip is always available
+    from brotli_asgi import BrotliMiddleware
+except ImportError:  # pragma: no cover
+    BrotliMiddleware = None
+
 try:  # pragma: no cover - allow running as a module or package
-    from .install_manager import InstallError, InstallManager
+    from .http_cache import FrontendStaticFiles, conditional_json, make_etag
+    from .install_manager import (
+        DependentModsError,
+        InstallError,
+        InstallManager,
+        ModBusyError,
+    )
+    from .modlist import Modlist, ModlistError, export_modlist
     from .state_manager import InstalledMod, StateManager
     from .thunderstore import (
         ThunderstoreError,
+        catalog_generation,
+        fetch_all_packages,
         format_dependency,
         get_package,
         latest_version,
+        lookup_package,
         search_packages,
     )
 except ImportError:  # pragma: no cover - fallback for `python -m backend`
-    from install_manager import InstallError, InstallManager
+    from http_cache import FrontendStaticFiles, conditional_json, make_etag
+    from install_manager import (
+        DependentModsError,
+        InstallError,
+        InstallManager,
+        ModBusyError,
+    )
+    from modlist import Modlist, ModlistError, export_modlist
     from state_manager import InstalledMod, StateManager
     from thunderstore import (
         ThunderstoreError,
+        catalog_generation,
+        fetch_all_packages,
         format_dependency,
         get_package,
         latest_version,
+        lookup_package,
         search_packages,
     )
 
@@ -37,8 +64,25 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
+
+@app.exception_handler(Timeout)
+async def lock_timeout_handler(request: Request, exc: Timeout):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "The mod manager is busy with another operation. Try again shortly."},
+    )
+
+
+COMPRESSION_MINIMUM_SIZE = 500
+
+if BrotliMiddleware is not None:
+    app.add_middleware(BrotliMiddleware, minimum_size=COMPRESSION_MINIMUM_SIZE, gzip_fallback=True)
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MINIMUM_SIZE)
+
 state_manager = StateManager()
 install_manager = InstallManager(state_manager)
 
@@ -66,9 +110,17 @@ class InstallRequest(BaseModel):
     version: Optional[str] = None
 
 
+class UninstallRequest(BaseModel):
+    namespace: str
+    name: str
+    cascade: bool = False
+    prune_orphans: bool = True
+
+
 class BlacklistRequest(BaseModel):
     namespace: str
     name: str
+    cascade: bool = False
 
 
 class GameDirectoryRequest(BaseModel):
@@ -90,6 +142,30 @@ class InstalledModModel(BaseModel):
     icon: Optional[str]
     dependencies: List[str]
     installed_files: List[InstalledFileModel]
+    installed_as_dependency: bool
+
+
+class LockedModModel(BaseModel):
+    namespace: str
+    name: str
+    version: str
+    download_url: str = ""
+    archive_sha256: Optional[str] = None
+    dependencies: List[str] = []
+    installed_as_dependency: bool = False
+
+
+class ModlistModel(BaseModel):
+    version: int
+    mods: List[LockedModModel]
+    unpinned: List[str] = []
+
+
+class ModlistImportResponse(BaseModel):
+    installed: List[str]
+    skipped: List[str]
+    failed: Dict[str, str]
+    unverified: List[str]
 
 
 class SettingsResponse(BaseModel):
@@ -120,14 +196,17 @@ def map_package_to_summary(package: Dict) -> ModSummary:
 
 
 @app.get("/api/mods", response_model=List[ModSummary])
-def list_mods(search: Optional[str] = None, limit: int = 50, offset: int = 0):
+def list_mods(request: Request, search: Optional[str] = None, limit: int = 50, offset: int = 0):
     try:
         packages = search_packages(search)
     except ThunderstoreError as exc:
         raise HTTPException(status_code=502, detail=str(exc)) from exc
 
+    etag = make_etag("mods", catalog_generation(), search or "", limit, offset)
     sliced = packages[offset : offset + limit]
-    return [map_package_to_summary(pkg) for pkg in sliced]
+    return conditional_json(
+        request, etag, lambda: [map_package_to_summary(pkg) for pkg in sliced]
+    )
 
 
 @app.get("/api/mods/{namespace}/{name}", response_model=ModDetail)
@@ -166,21 +245,50 @@ def install_mod(request: InstallRequest):
         mod = install_manager.install(request.namespace, request.name, request.version)
         detail = get_mod_detail(request.namespace, request.name)
         return detail
+    except ModBusyError as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
     except InstallError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
 
+def _dependents_conflict(exc: DependentModsError) -> HTTPException:
+    return HTTPException(
+        status_code=409,
+        detail={
+            "message": str(exc),
+            "dependents": [mod.key for mod in exc.dependents],
+        },
+    )
+
+
 @app.post("/api/mods/uninstall")
-def uninstall_mod(request: InstallRequest):
-    install_manager.uninstall(request.namespace, request.name)
-    return {"status": "ok"}
+def uninstall_mod(request: UninstallRequest):
+    try:
+        removed = install_manager.uninstall(
+            request.namespace,
+            request.name,
+            cascade=request.cascade,
+            prune_orphans=request.prune_orphans,
+        )
+    except DependentModsError as exc:
+        raise _dependents_conflict(exc) from exc
+    except ModBusyError as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+    return {"status": "ok", "removed": [mod.key for mod in removed]}
 
 
 @app.post("/api/mods/blacklist")
 def blacklist_mod(request: BlacklistRequest):
+    try:
+        removed = install_manager.uninstall(
+            request.namespace, request.name, cascade=request.cascade
+        )
+    except DependentModsError as exc:
+        raise _dependents_conflict(exc) from exc
+    except ModBusyError as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
     state_manager.add_to_blacklist(request.namespace, request.name)
-    install_manager.uninstall(request.namespace, request.name)
-    return {"status": "ok"}
+    return {"status": "ok", "removed": [mod.key for mod in removed]}
 
 
 @app.post("/api/mods/whitelist")
@@ -189,8 +297,7 @@ def whitelist_mod(request: BlacklistRequest):
     return {"status": "ok"}
 
 
-@app.get("/api/mods/installed", response_model=List[InstalledModModel])
-def list_installed_mods():
+def _build_installed_models() -> List[InstalledModModel]:
     mods: List[InstalledMod] = state_manager.list_installed_mods()
     return [
         InstalledModModel(
@@ -207,16 +314,41 @@ def list_installed_mods():
                 InstalledFileModel(relative_path=file.relative_path)
                 for file in mod.installed_files
             ],
+            installed_as_dependency=mod.installed_as_dependency,
         )
         for mod in mods
     ]
 
 
+@app.get("/api/mods/installed", response_model=List[InstalledModModel])
+def list_installed_mods(request: Request):
+    etag = make_etag("installed", state_manager.generation)
+    return conditional_json(request, etag, _build_installed_models)
+
+
 @app.get("/api/mods/blacklisted")
 def list_blacklisted_mods():
     return state_manager.list_blacklisted_mods()
 
 
+@app.get("/api/modlist/export", response_model=ModlistModel)
+def export_installed_modlist(request: Request, hash_missing: bool = False):
+    if hash_missing:
+        install_manager.backfill_archive_hashes()
+    etag = make_etag("modlist", state_manager.generation)
+    return conditional_json(request, etag, lambda: export_modlist(state_manager).to_dict())
+
+
+@app.post("/api/modlist/import", response_model=ModlistImportResponse)
+def import_modlist(request: ModlistModel):
+    try:
+        modlist = Modlist.from_dict(jsonable_encoder(request))
+        result = install_manager.install_modlist(modlist)
+    except (ModlistError, InstallError) as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return result.to_dict()
+
+
 @app.post("/api/settings/game-directory")
 def set_game_directory(request: GameDirectoryRequest):
     path = Path(request.path)
@@ -233,7 +365,7 @@ def get_settings():
 
 def _build_notification(mod: InstalledMod) -> Optional[NotificationModel]:
     try:
-        package = get_package(mod.namespace, mod.name)
+        package = lookup_package(mod.namespace, mod.name)
     except ThunderstoreError:
         return None
 
@@ -256,8 +388,7 @@ def _build_notification(mod: InstalledMod) -> Optional[NotificationModel]:
     )
 
 
-@app.get("/api/notifications", response_model=List[NotificationModel])
-def list_notifications():
+def _build_notifications() -> List[NotificationModel]:
     notifications: List[NotificationModel] = []
     for mod in state_manager.list_installed_mods():
         notification = _build_notification(mod)
@@ -266,12 +397,23 @@ def list_notifications():
     return notifications
 
 
+@app.get("/api/notifications", response_model=List[NotificationModel])
+def list_notifications(request: Request):
+    try:
+        # Load (or refresh) the catalog first so the ETag reflects its current generation.
+        fetch_all_packages()
+    except ThunderstoreError:
+        pass
+    etag = make_etag("notifications", state_manager.generation, catalog_generation())
+    return conditional_json(request, etag, _build_notifications)
+
+
 FRONTEND_DIR = Path(__file__).resolve().parent.parent / "frontend"
 
 if FRONTEND_DIR.exists():
     app.mount(
         "/app",
-        StaticFiles(directory=FRONTEND_DIR, html=True),
+        FrontendStaticFiles(directory=FRONTEND_DIR, html=True),
         name="frontend",
     )
 
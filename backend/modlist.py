@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+from .state_manager import StateManager
+
+LOCKFILE_VERSION = 1
+
+
+class ModlistError(ValueError):
+    pass
+
+
+@dataclass
+class LockedMod:
+    namespace: str
+    name: str
+    version: str
+    download_url: str = ""
+    archive_sha256: Optional[str] = None
+    dependencies: List[str] = field(default_factory=list)
+    installed_as_dependency: bool = False
+
+    @property
+    def key(self) -> str:
+        return f"{self.namespace}.{self.name}"
+
+    @staticmethod
+    def from_dict(data: Dict) -> "LockedMod":
+        try:
+            return LockedMod(
+                namespace=data["namespace"],
+                name=data["name"],
+                version=data["version"],
+                download_url=data.get("download_url", ""),
+                archive_sha256=data.get("archive_sha256"),
+                dependencies=data.get("dependencies", []),
+                installed_as_dependency=data.get("installed_as_dependency", False),
+            )
+        except KeyError as exc:
+            raise ModlistError(f"Modlist entry is missing {exc}") from exc
+
+
+@dataclass
+class Modlist:
+    mods: List[LockedMod] = field(default_factory=list)
+    version: int = LOCKFILE_VERSION
+
+    @property
+    def unpinned(self) -> List[str]:
+        return [mod.key for mod in self.mods if not mod.archive_sha256]
+
+    def to_dict(self) -> Dict:
+        return {
+            "version": self.version,
+            "mods": [asdict(mod) for mod in self.mods],
+            "unpinned": self.unpinned,
+        }
+
+    @staticmethod
+    def from_dict(data: Dict) -> "Modlist":
+        version = data.get("version", LOCKFILE_VERSION)
+        if version != LOCKFILE_VERSION:
+            raise ModlistError(f"Unsupported modlist version: {version}")
+        return Modlist(
+            mods=[LockedMod.from_dict(entry) for entry in data.get("mods", [])],
+            version=version,
+        )
+
+
+@dataclass
+class ModlistImportResult:
+    installed: List[str] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)
+    failed: Dict[str, str] = field(default_factory=dict)
+    # Installed without an archive hash in the lockfile, so nothing was verified.
+    unverified: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+def export_modlist(state_manager: StateManager) -> Modlist:
+    mods = sorted(state_manager.list_installed_mods(), key=lambda mod: mod.key)
+    return Modlist(
+        mods=[
+            LockedMod(
+                namespace=mod.namespace,
+                name=mod.name,
+                version=mod.version,
+                download_url=mod.download_url,
+                archive_sha256=mod.archive_sha256,
+                dependencies=list(mod.dependencies),
+                installed_as_dependency=mod.installed_as_dependency,
+            )
+            for mod in mods
+        ]
+    )
@@ -1,11 +1,14 @@
 from __future__ import annotations
 
-import json
+from contextlib import contextmanager
 from dataclasses import dataclass, field, asdict
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
-STATE_FILE = Path(__file__).resolve().parent / "data" / "state.json"
+from .storage import DATA_DIR, file_lock, file_stamp, read_json, write_json_atomic
+from .thunderstore import format_dependency
+
+STATE_FILE = DATA_DIR / "state.json"
 
 
 @dataclass
@@ -25,6 +28,16 @@ class InstalledMod:
     icon: Optional[str]
     dependencies: List[str] = field(default_factory=list)
     installed_files: List[InstalledFile] = field(default_factory=list)
+    installed_as_dependency: bool = False
+    archive_sha256: Optional[str] = None
+
+    @property
+    def key(self) -> str:
+        return f"{self.namespace}.{self.name}"
+
+    @property
+    def dependency_keys(self) -> List[str]:
+        return [format_dependency(dep) for dep in self.dependencies]
 
     def to_dict(self) -> Dict:
         data = asdict(self)
@@ -45,6 +58,8 @@ class InstalledMod:
             icon=data.get("icon"),
             dependencies=data.get("dependencies", []),
             installed_files=files,
+            installed_as_dependency=data.get("installed_as_dependency", False),
+            archive_sha256=data.get("archive_sha256"),
         )
 
 
@@ -53,9 +68,11 @@ class AppState:
     game_directory: Optional[str] = None
     installed_mods: Dict[str, InstalledMod] = field(default_factory=dict)
     blacklisted_mods: List[str] = field(default_factory=list)
+    generation: int = 0
 
     def to_dict(self) -> Dict:
         return {
+            "generation": self.generation,
             "game_directory": self.game_directory,
             "installed_mods": {k: v.to_dict() for k, v in self.installed_mods.items()},
             "blacklisted_mods": self.blacklisted_mods,
@@ -71,71 +88,219 @@ class AppState:
             game_directory=data.get("game_directory"),
             installed_mods=installed,
             blacklisted_mods=data.get("blacklisted_mods", []),
+            generation=data.get("generation", 0),
         )
 
 
 class StateManager:
+    """Persists application state in ``state.json``.
+
+    Every worker process keeps its own in-memory copy; access goes through a
+    file lock and the copy is reloaded whenever another process replaced the
+    file, so all workers observe the same state. A reverse-dependency index
+    (dependency key -> keys of installed mods requiring it) is kept alongside.
+    """
+
     def __init__(self, state_file: Path = STATE_FILE):
         self.state_file = state_file
         self.state_file.parent.mkdir(parents=True, exist_ok=True)
-        self._state = self._load_state()
+        self._lock = file_lock(self.state_file)
+        self._stamp = None
+        self._state = AppState()
+        self._dependents: Dict[str, Set[str]] = {}
+        with self._lock:
+            self._refresh()
 
-    def _load_state(self) -> AppState:
-        if not self.state_file.exists():
-            return AppState()
-        with self.state_file.open("r", encoding="utf-8") as f:
-            raw = json.load(f)
-        return AppState.from_dict(raw)
+    def _refresh(self) -> None:
+        stamp = file_stamp(self.state_file)
+        if stamp == self._stamp:
+            return
+        self._state = AppState.from_dict(read_json(self.state_file)) if stamp else AppState()
+        self._stamp = stamp
+        self._dependents = {}
+        for mod in self._state.installed_mods.values():
+            self._index_mod(mod)
+
+    def _index_mod(self, mod: InstalledMod) -> None:
+        for dep_key in mod.dependency_keys:
+            self._dependents.setdefault(dep_key, set()).add(mod.key)
+
+    def _unindex_mod(self, mod: InstalledMod) -> None:
+        for dep_key in mod.dependency_keys:
+            dependents = self._dependents.get(dep_key)
+            if dependents is not None:
+                dependents.discard(mod.key)
+                if not dependents:
+                    del self._dependents[dep_key]
+
+    @contextmanager
+    def _locked(self) -> Iterator[AppState]:
+        with self._lock:
+            self._refresh()
+            yield self._state
 
     def save(self) -> None:
-        with self.state_file.open("w", encoding="utf-8") as f:
-            json.dump(self._state.to_dict(), f, indent=2)
+        with self._lock:
+            self._state.generation += 1
+            write_json_atomic(self.state_file, self._state.to_dict(), indent=2)
+            self._stamp = file_stamp(self.state_file)
 
     @property
     def state(self) -> AppState:
-        return self._state
+        with self._locked() as state:
+            return state
+
+    @property
+    def generation(self) -> int:
+        with self._locked() as state:
+            return state.generation
 
     def update_game_directory(self, path: str) -> None:
-        self._state.game_directory = path
-        self.save()
+        with self._locked() as state:
+            state.game_directory = path
+            self.save()
 
     def get_game_directory(self) -> Optional[str]:
-        return self._state.game_directory
+        with self._locked() as state:
+            return state.game_directory
 
     def install_mod(self, mod: InstalledMod) -> None:
-        key = f"{mod.namespace}.{mod.name}"
-        self._state.installed_mods[key] = mod
-        self.save()
+        self.install_mods([mod])
+
+    def install_mods(self, mods: Iterable[InstalledMod]) -> None:
+        with self._locked() as state:
+            changed = False
+            for mod in mods:
+                previous = state.installed_mods.get(mod.key)
+                if previous is not None:
+                    self._unindex_mod(previous)
+                state.installed_mods[mod.key] = mod
+                self._index_mod(mod)
+                changed = True
+            if changed:
+                self.save()
 
     def uninstall_mod(self, namespace: str, name: str) -> Optional[InstalledMod]:
+        removed = self.uninstall_mods([f"{namespace}.{name}"])
+        return removed[0] if removed else None
+
+    def uninstall_mods(self, keys: Iterable[str]) -> List[InstalledMod]:
+        with self._locked() as state:
+            removed: List[InstalledMod] = []
+            for key in keys:
+                mod = state.installed_mods.pop(key, None)
+                if mod:
+                    self._unindex_mod(mod)
+                    removed.append(mod)
+            if removed:
+                self.save()
+            return removed
+
+    def record_archive_hashes(self, hashes: Dict[str, Tuple[str, str]]) -> None:
+        """Store ``{key: (version, sha256)}`` for mods still installed at that version."""
+        with self._locked() as state:
+            changed = False
+            for key, (version, digest) in hashes.items():
+                mod = state.installed_mods.get(key)
+                if mod and mod.version == version and mod.archive_sha256 != digest:
+                    mod.archive_sha256 = digest
+                    changed = True
+            if changed:
+                self.save()
+
+    def get_dependents(self, namespace: str, name: str) -> List[InstalledMod]:
         key = f"{namespace}.{name}"
-        mod = self._state.installed_mods.pop(key, None)
-        if mod:
-            self.save()
-        return mod
+        with self._locked() as state:
+            return [
+                state.installed_mods[dependent]
+                for dependent in sorted(self._dependents.get(key, ()))
+                if dependent in state.installed_mods
+            ]
+
+    def plan_removal(
+        self, namespace: str, name: str, cascade: bool = False, prune_orphans: bool = True
+    ) -> Tuple[List[InstalledMod], List[InstalledMod]]:
+        """Return ``(mods to remove, blocking dependents)`` for uninstalling ``namespace.name``.
+
+        Without ``cascade`` nothing is removed while other installed mods depend
+        on it; those dependents are returned instead. With ``cascade`` every
+        installed mod that (transitively) depends on it is included. With
+        ``prune_orphans`` dependencies that were only pulled in for the removed
+        mods and are no longer required by anything are added too. The check and
+        the plan are made under a single state lock.
+        """
+        root = f"{namespace}.{name}"
+        with self._locked() as state:
+            if root not in state.installed_mods:
+                return [], []
+            if not cascade:
+                dependents = [
+                    state.installed_mods[dependent]
+                    for dependent in sorted(self._dependents.get(root, ()))
+                    if dependent in state.installed_mods
+                ]
+                if dependents:
+                    return [], dependents
+
+            removal: Set[str] = set()
+            pending = [root]
+            while pending:
+                key = pending.pop()
+                if key in removal or key not in state.installed_mods:
+                    continue
+                removal.add(key)
+                if cascade:
+                    pending.extend(self._dependents.get(key, ()))
+
+            if prune_orphans:
+                candidates = [
+                    dep_key
+                    for key in removal
+                    for dep_key in state.installed_mods[key].dependency_keys
+                ]
+                while candidates:
+                    key = candidates.pop()
+                    mod = state.installed_mods.get(key)
+                    if (
+                        mod is None
+                        or key in removal
+                        or not mod.installed_as_dependency
+                        or not self._dependents.get(key, set()) <= removal
+                    ):
+                        continue
+                    removal.add(key)
+                    candidates.extend(mod.dependency_keys)
+
+            return [state.installed_mods[key] for key in sorted(removal)], []
 
     def get_installed_mod(self, namespace: str, name: str) -> Optional[InstalledMod]:
         key = f"{namespace}.{name}"
-        return self._state.installed_mods.get(key)
+        with self._locked() as state:
+            return state.installed_mods.get(key)
 
     def list_installed_mods(self) -> List[InstalledMod]:
-        return list(self._state.installed_mods.values())
+        with self._locked() as state:
+            return list(state.installed_mods.values())
 
     def add_to_blacklist(self, namespace: str, name: str) -> None:
         key = f"{namespace}.{name}"
-        if key not in self._state.blacklisted_mods:
-            self._state.blacklisted_mods.append(key)
-            self.save()
+        with self._locked() as state:
+            if key not in state.blacklisted_mods:
+                state.blacklisted_mods.append(key)
+                self.save()
 
     def remove_from_blacklist(self, namespace: str, name: str) -> None:
         key = f"{namespace}.{name}"
-        if key in self._state.blacklisted_mods:
-            self._state.blacklisted_mods.remove(key)
-            self.save()
+        with self._locked() as state:
+            if key in state.blacklisted_mods:
+                state.blacklisted_mods.remove(key)
+                self.save()
 
     def is_blacklisted(self, namespace: str, name: str) -> bool:
         key = f"{namespace}.{name}"
-        return key in self._state.blacklisted_mods
+        with self._locked() as state:
+            return key in state.blacklisted_mods
 
     def list_blacklisted_mods(self) -> List[str]:
-        return list(self._state.blacklisted_mods)
+        with self._locked() as state:
+            return list(state.blacklisted_mods)
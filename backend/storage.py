@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+from filelock import FileLock
+
+DATA_DIR = Path(__file__).resolve().parent / "data"
+LOCK_TIMEOUT = 120
+
+FileStamp = Tuple[int, int, int]
+
+
+def file_lock(path: Path, timeout: float = LOCK_TIMEOUT) -> FileLock:
+    """Return a lock that serialises access to ``path`` across threads and processes."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return FileLock(str(path.parent / f"{path.name}.lock"), timeout=timeout)
+
+
+def file_stamp(path: Path) -> Optional[FileStamp]:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def read_json(path: Path) -> Any:
+    with path.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_json_atomic(path: Path, data: Any, **dump_kwargs: Any) -> None:
+    # Readers in other workers must never observe a half-written file.
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, **dump_kwargs)
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
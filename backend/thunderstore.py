@@ -1,13 +1,27 @@
 from __future__ import annotations
 
+import time
 from functools import lru_cache
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 import requests
 
+from .storage import DATA_DIR, FileStamp, file_lock, file_stamp, read_json, write_json_atomic
+
 THUNDERSTORE_BASE = "https://thunderstore.io/api/experimental/package"
 REQUEST_TIMEOUT = 30
 
+# The package catalog is shared by every worker through a cache file; only one
+# worker downloads it while the others wait on the lock and then read the result.
+CATALOG_CACHE_FILE = DATA_DIR / "catalog.json"
+CATALOG_TTL = 60 * 60
+# After a failed refresh the stale catalog keeps being served, and no worker
+# retries the download until this many seconds have passed.
+CATALOG_RETRY_FILE = DATA_DIR / "catalog.retry"
+CATALOG_RETRY_DELAY = 5 * 60
+
+_catalog: Optional[Tuple[FileStamp, List[Dict]]] = None
+
 
 class ThunderstoreError(RuntimeError):
     pass
@@ -25,10 +39,63 @@ def _get(url: str) -> requests.Response:
     return response
 
 
-@lru_cache(maxsize=1)
+def _catalog_is_fresh(stamp: Optional[FileStamp]) -> bool:
+    return stamp is not None and time.time() - stamp[1] / 1e9 < CATALOG_TTL
+
+
+def _refresh_backed_off() -> bool:
+    stamp = file_stamp(CATALOG_RETRY_FILE)
+    return stamp is not None and time.time() - stamp[1] / 1e9 < CATALOG_RETRY_DELAY
+
+
+def _load_catalog(stamp: FileStamp) -> List[Dict]:
+    global _catalog
+    if _catalog is None or _catalog[0] != stamp:
+        _catalog = (stamp, read_json(CATALOG_CACHE_FILE))
+    return _catalog[1]
+
+
 def fetch_all_packages() -> List[Dict]:
-    response = _get(f"{THUNDERSTORE_BASE}/")
-    return response.json()
+    stamp = file_stamp(CATALOG_CACHE_FILE)
+    if _catalog_is_fresh(stamp) or (stamp and _refresh_backed_off()):
+        return _load_catalog(stamp)
+
+    with file_lock(CATALOG_CACHE_FILE):
+        # Another worker may have refreshed the cache while we waited.
+        stamp = file_stamp(CATALOG_CACHE_FILE)
+        if _catalog_is_fresh(stamp) or (stamp and _refresh_backed_off()):
+            return _load_catalog(stamp)
+        try:
+            packages = _get(f"{THUNDERSTORE_BASE}/").json()
+        except ThunderstoreError:
+            if stamp is None:
+                raise
+            CATALOG_RETRY_FILE.touch()
+            return _load_catalog(stamp)
+        write_json_atomic(CATALOG_CACHE_FILE, packages)
+        CATALOG_RETRY_FILE.unlink(missing_ok=True)
+        return _load_catalog(file_stamp(CATALOG_CACHE_FILE))
+
+
+def catalog_generation() -> int:
+    return _catalog[0][1] if _catalog else 0
+
+
+@lru_cache(maxsize=1)
+def _catalog_index(generation: int) -> Dict[str, Dict]:
+    return {
+        f"{package.get('namespace', package.get('owner', ''))}.{package.get('name', '')}": package
+        for package in fetch_all_packages()
+    }
+
+
+def lookup_package(namespace: str, name: str) -> Dict:
+    try:
+        fetch_all_packages()
+        index = _catalog_index(catalog_generation())
+    except ThunderstoreError:
+        return get_package(namespace, name)
+    return index.get(f"{namespace}.{name}") or get_package(namespace, name)
 
 
 def search_packages(query: Optional[str] = None) -> List[Dict]:
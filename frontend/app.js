@@ -45,6 +45,10 @@ const elements = {
   settingsInput: document.getElementById("game-directory-input"),
   settingsSave: document.getElementById("save-settings"),
   settingsStatus: document.getElementById("settings-status"),
+  modlistExport: document.getElementById("export-modlist"),
+  modlistImport: document.getElementById("import-modlist"),
+  modlistFile: document.getElementById("import-modlist-file"),
+  modlistStatus: document.getElementById("modlist-status"),
 };
 
 function toggleSidebar(show) {
@@ -267,12 +271,31 @@ async function whitelistMod(namespace, name) {
   }
 }
 
+async function postWithDependentsPrompt(path, payload) {
+  const send = (cascade) =>
+    fetch(`${API_BASE}${path}`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ ...payload, cascade }),
+    });
+  const res = await send(false);
+  if (res.status !== 409) return;
+  const error = await res.json().catch(() => ({ detail: {} }));
+  if (typeof error.detail === "string") {
+    alert(error.detail);
+    return;
+  }
+  const dependents = (error.detail && error.detail.dependents) || [];
+  const confirmed = window.confirm(
+    `${payload.name} is required by:\n${dependents.join("\n")}\n\nRemove those mods as well?`
+  );
+  if (confirmed) {
+    await send(true);
+  }
+}
+
 async function blacklistMod(namespace, name) {
-  await fetch(`${API_BASE}/api/mods/blacklist`, {
-    method: "POST",
-    headers: { "Content-Type": "application/json" },
-    body: JSON.stringify({ namespace, name }),
-  });
+  await postWithDependentsPrompt("/api/mods/blacklist", { namespace, name });
   await refreshState();
   if (state.selectedMod) {
     updateModDetail(state.selectedMod);
@@ -316,11 +339,7 @@ async function installMod(namespace, name) {
 }
 
 async function uninstallMod(namespace, name) {
-  await fetch(`${API_BASE}/api/mods/uninstall`, {
-    method: "POST",
-    headers: { "Content-Type": "application/json" },
-    body: JSON.stringify({ namespace, name }),
-  });
+  await postWithDependentsPrompt("/api/mods/uninstall", { namespace, name });
   await refreshState();
   if (state.selectedMod) {
     updateModDetail(state.selectedMod);
@@ -373,6 +392,72 @@ function renderSettings() {
   elements.settingsInput.value = state.settings.gameDirectory;
 }
 
+async function fetchModlist(hashMissing) {
+  const query = hashMissing ? "?hash_missing=true" : "";
+  const res = await fetch(`${API_BASE}/api/modlist/export${query}`);
+  return res.ok ? res.json() : null;
+}
+
+async function exportModlist() {
+  let modlist = await fetchModlist(false);
+  if (modlist && modlist.unpinned.length) {
+    const confirmed = window.confirm(
+      `${modlist.unpinned.length} mods have no recorded archive hash. Download them now to pin their hashes?`
+    );
+    if (confirmed) {
+      elements.modlistStatus.textContent = "Hashing archives…";
+      modlist = await fetchModlist(true);
+    }
+  }
+  if (!modlist) {
+    elements.modlistStatus.textContent = "Unable to export modlist.";
+    return;
+  }
+  const blob = new Blob([JSON.stringify(modlist, null, 2)], { type: "application/json" });
+  const link = document.createElement("a");
+  link.href = URL.createObjectURL(blob);
+  link.download = "modlist.json";
+  link.click();
+  URL.revokeObjectURL(link.href);
+  const unpinned = modlist.unpinned.length ? ` ${modlist.unpinned.length} without archive hash.` : "";
+  elements.modlistStatus.textContent = `Exported ${modlist.mods.length} mods.${unpinned}`;
+}
+
+async function importModlist(file) {
+  let modlist;
+  try {
+    modlist = JSON.parse(await file.text());
+  } catch (error) {
+    elements.modlistStatus.textContent = "The selected file is not a valid modlist.";
+    return;
+  }
+  elements.modlistStatus.textContent = `Importing ${(modlist.mods || []).length} mods…`;
+  const res = await fetch(`${API_BASE}/api/modlist/import`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(modlist),
+  });
+  if (!res.ok) {
+    const error = await res.json().catch(() => ({ detail: "Import failed" }));
+    elements.modlistStatus.textContent =
+      typeof error.detail === "string" ? error.detail : "Import failed";
+    return;
+  }
+  const result = await res.json();
+  const failed = Object.entries(result.failed);
+  const unverified = result.unverified.length
+    ? ` ${result.unverified.length} installed without hash verification.`
+    : "";
+  elements.modlistStatus.textContent = `Installed ${result.installed.length}, skipped ${result.skipped.length}, failed ${failed.length}.${unverified}`;
+  if (failed.length) {
+    console.warn("Modlist import failures", result.failed);
+  }
+  if (result.unverified.length) {
+    console.warn("Modlist entries installed without hash verification", result.unverified);
+  }
+  await refreshState();
+}
+
 async function loadNotifications() {
   const res = await fetch(`${API_BASE}/api/notifications`);
   if (res.ok) {
@@ -466,6 +551,15 @@ function attachEventListeners() {
   });
   elements.notificationButton.addEventListener("click", toggleNotificationPanel);
   elements.settingsSave.addEventListener("click", saveSettings);
+  elements.modlistExport.addEventListener("click", exportModlist);
+  elements.modlistImport.addEventListener("click", () => elements.modlistFile.click());
+  elements.modlistFile.addEventListener("change", async () => {
+    const [file] = elements.modlistFile.files;
+    elements.modlistFile.value = "";
+    if (file) {
+      await importModlist(file);
+    }
+  });
   document.addEventListener("keydown", (event) => {
     if (event.key === "Escape") {
       closeOverlays();